@@ -4,7 +4,7 @@ import { motion, AnimatePresence } from 'motion/react';
 import { User, Task, AdTask, AdView, TaskSubmission, WithdrawalRequest, TaskStatus, MaintenanceSettings, Transaction, CurrencyInfo } from './types';
 import { getCurrentUser, getTasks, saveTasks, getAdTasks, saveAdTasks, getAdViews, saveAdViews, getSubmissions, saveSubmissions, getWithdrawals, saveWithdrawals, getUsers, saveUsers, saveActiveTask, getActiveTask, getMaintenanceSettings, saveMaintenanceSettings, getTransactions, saveTransactions, ADMIN_TELEGRAM_ID, isUserAdmin } from './state';
 import { EXCHANGE_RATES, CURRENCY_LABELS } from './constants';
-import { fetchWithTimeout } from './services/api';
+import { fetchWithTimeout, fetchPage } from './services/api';
 import { TelegramService } from './services/telegram';
 import { SecurityService } from './services/security';
 import Navigation from './components/Navigation';
@@ -61,6 +61,10 @@ const App: React.FC = () => {
   const [adViews, setAdViews] = useState<AdView[]>(getAdViews());
   const [submissions, setSubmissions] = useState<TaskSubmission[]>(getSubmissions());
   const [withdrawals, setWithdrawals] = useState<WithdrawalRequest[]>(getWithdrawals());
+  // Admin listings load one page at a time; these hold the X-Next-Cursor of the last page loaded
+  const [usersCursor, setUsersCursor] = useState<string | null>(null);
+  const [withdrawalsCursor, setWithdrawalsCursor] = useState<string | null>(null);
+  const olderPagesLoaded = useRef({ users: false, withdrawals: false });
   const [transactions, setTransactions] = useState<Transaction[]>(getTransactions());
   const [maintenance, setMaintenance] = useState<MaintenanceSettings>(getMaintenanceSettings());
   const [currencyInfo, setCurrencyInfo] = useState<CurrencyInfo>({
@@ -269,6 +273,45 @@ const App: React.FC = () => {
     }
   };
 
+  // Map backend withdrawal fields to frontend types
+  const mapWithdrawal = (w: any) => ({
+    id: w._id,
+    userId: w.userId,
+    amount: w.amount,
+    currency: (w.currency === 'SAR' ? 'Riyal' : 'Crypto') as WithdrawalRequest['currency'],
+    method: w.method,
+    address: w.address,
+    status: w.status,
+    createdAt: w.createdAt,
+    processedAt: w.processedAt
+  });
+
+  // Newer items first, then the already loaded ones they don't replace
+  const mergeById = <T extends { id: any }>(newer: T[], older: T[]): T[] => {
+    const ids = new Set(newer.map(item => item.id));
+    return [...newer, ...older.filter(item => !ids.has(item.id))];
+  };
+
+  const loadMoreUsers = async () => {
+    if (!usersCursor) return;
+    const apiUrl = import.meta.env.VITE_API_URL || '';
+    const page = await fetchPage(`${apiUrl}/api/admin/users?admin_id=${currentUser.id}`, usersCursor);
+    if (!page) return;
+    olderPagesLoaded.current.users = true;
+    setUsers(prev => mergeById(prev, page.items));
+    setUsersCursor(page.nextCursor);
+  };
+
+  const loadMoreWithdrawals = async () => {
+    if (!withdrawalsCursor) return;
+    const apiUrl = import.meta.env.VITE_API_URL || '';
+    const page = await fetchPage(`${apiUrl}/api/admin/withdrawals?admin_id=${currentUser.id}`, withdrawalsCursor, 4000);
+    if (!page) return;
+    olderPagesLoaded.current.withdrawals = true;
+    setWithdrawals(prev => mergeById(prev, page.items.map(mapWithdrawal)));
+    setWithdrawalsCursor(page.nextCursor);
+  };
+
   const fetchLiveStats = async (silent = false) => {
     if (!currentUser?.id || isSyncingRef.current) return;
     isSyncingRef.current = true;
@@ -298,16 +341,18 @@ const App: React.FC = () => {
         
         setLiveRank(data.rank || null);
         
-        // If admin, fetch all users for the admin panel
+        // If admin, fetch the newest page of users for the admin panel (older pages load on demand)
         if (isAdmin || isUserAdmin(currentUser.id)) {
           try {
-            const usersRes = await fetchWithTimeout(`${apiUrl}/api/admin/users?admin_id=${currentUser.id}`);
-            if (usersRes.ok) {
-              const allUsers = await usersRes.json();
-              if (allUsers && Array.isArray(allUsers)) {
-                setUsers(allUsers);
-                saveUsers(allUsers);
+            const page = await fetchPage(`${apiUrl}/api/admin/users?admin_id=${currentUser.id}`);
+            if (page) {
+              if (olderPagesLoaded.current.users) {
+                setUsers(prev => mergeById(page.items, prev));
+              } else {
+                setUsers(page.items);
+                setUsersCursor(page.nextCursor);
               }
+              saveUsers(page.items);
             }
           } catch (err) {
             console.warn('Failed to fetch all users for admin:', err);
@@ -389,29 +434,26 @@ const App: React.FC = () => {
         }
       }
 
-      // Fetch Withdrawals
-      const withdrawalsRes = await fetchWithTimeout(
-        isAdmin 
-          ? `${apiUrl}/api/admin/withdrawals?admin_id=${currentUser.id}` 
-          : `${apiUrl}/api/user/withdrawals/${currentUser.id}`, 
-        {}, 4000
-      );
-      if (withdrawalsRes.ok) {
-        const withdrawalsData = await withdrawalsRes.json();
-        // Map backend fields to frontend types if needed
-        const mappedWithdrawals = withdrawalsData.map((w: any) => ({
-          id: w._id,
-          userId: w.userId,
-          amount: w.amount,
-          currency: w.currency === 'SAR' ? 'Riyal' : 'Crypto',
-          method: w.method,
-          address: w.address,
-          status: w.status,
-          createdAt: w.createdAt,
-          processedAt: w.processedAt
-        }));
-        setWithdrawals(mappedWithdrawals);
-        saveWithdrawals(mappedWithdrawals);
+      // Fetch Withdrawals (admins get the newest page, older pages load on demand)
+      if (isAdmin) {
+        const page = await fetchPage(`${apiUrl}/api/admin/withdrawals?admin_id=${currentUser.id}`, null, 4000);
+        if (page) {
+          const mappedWithdrawals = page.items.map(mapWithdrawal);
+          if (olderPagesLoaded.current.withdrawals) {
+            setWithdrawals(prev => mergeById(mappedWithdrawals, prev));
+          } else {
+            setWithdrawals(mappedWithdrawals);
+            setWithdrawalsCursor(page.nextCursor);
+          }
+          saveWithdrawals(mappedWithdrawals);
+        }
+      } else {
+        const withdrawalsRes = await fetchWithTimeout(`${apiUrl}/api/user/withdrawals/${currentUser.id}`, {}, 4000);
+        if (withdrawalsRes.ok) {
+          const mappedWithdrawals = (await withdrawalsRes.json()).map(mapWithdrawal);
+          setWithdrawals(mappedWithdrawals);
+          saveWithdrawals(mappedWithdrawals);
+        }
       }
 
     } catch (error) {
@@ -1257,7 +1299,7 @@ const App: React.FC = () => {
             {currentTab === 'tasks' && <TasksHub user={currentUser} tasks={tasks} adTasks={adTasks} submissions={submissions} adViews={adViews} onStartTask={handleStartExecution} onStartAd={handleStartExecution} onAddTask={handleAddTask} onAddAdTask={handleAddAdTask} isMaintenanceVideos={maintenance.videoTasks && !isAdmin} isMaintenanceAds={maintenance.adTasks && !isAdmin} isMaintenancePromote={maintenance.promote && !isAdmin} onGoToDeposit={() => setCurrentTab('wallet')} isSyncing={isSyncing} />}
             {currentTab === 'wallet' && <Wallet user={currentUser} withdrawals={withdrawals} transactions={transactions} onWithdraw={handleWithdrawRequest} isMaintenance={maintenance.wallet && !isAdmin} onUpdatePreference={(p) => setUsers(users.map(u => u.id === currentUser.id ? {...u, ...p} : u))} maintenanceSettings={maintenance} currencyInfo={currencyInfo} />}
             {currentTab === 'profile' && <Profile user={currentUser} maintenanceSettings={maintenance} onNavigate={setCurrentTab} onUpdateProfile={handleUpdateProfile} />}
-            {currentTab === 'admin' && (isSuperAdmin || isPreviewMode) && <Admin submissions={submissions} withdrawals={withdrawals} tasks={tasks} adTasks={adTasks} users={users} currentUser={currentUser} maintenanceSettings={maintenance} onUpdateMaintenance={handleUpdateMaintenance} onAction={handleAdminAction} onAddTask={handleAddTask} onAddAdTask={handleAddAdTask} onDeleteTask={handleDeleteTask} onDeleteAdTask={handleDeleteAdTask} onUnban={(uid) => setUsers(users.map(u => u.id === uid ? { ...u, isBanned: false, warningCount: 0 } : u))} onUpdateBalance={handleUpdateUserBalance} onResetLeaderboard={() => setUsers(users.map(u => ({...u, totalEarningsRiyal: 0})))} onApproveTask={handleApproveTask} onRejectTask={handleRejectTask} onResetDevice={handleResetDevice} />}
+            {currentTab === 'admin' && (isSuperAdmin || isPreviewMode) && <Admin submissions={submissions} withdrawals={withdrawals} tasks={tasks} adTasks={adTasks} users={users} currentUser={currentUser} maintenanceSettings={maintenance} onUpdateMaintenance={handleUpdateMaintenance} onAction={handleAdminAction} onAddTask={handleAddTask} onAddAdTask={handleAddAdTask} onDeleteTask={handleDeleteTask} onDeleteAdTask={handleDeleteAdTask} onUnban={(uid) => setUsers(users.map(u => u.id === uid ? { ...u, isBanned: false, warningCount: 0 } : u))} onUpdateBalance={handleUpdateUserBalance} onResetLeaderboard={() => setUsers(users.map(u => ({...u, totalEarningsRiyal: 0})))} onApproveTask={handleApproveTask} onRejectTask={handleRejectTask} onResetDevice={handleResetDevice} onLoadMoreUsers={usersCursor ? loadMoreUsers : undefined} onLoadMoreWithdrawals={withdrawalsCursor ? loadMoreWithdrawals : undefined} />}
           </motion.div>
         </AnimatePresence>
       </main>
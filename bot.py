@@ -1,53 +1,99 @@
 import os
+import hmac
 import json
+import math
+import time
+import queue
 import threading
+import requests
 import telebot
+from collections import deque
+from array import array
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from flask import Flask, request, jsonify
+from werkzeug.middleware.proxy_fix import ProxyFix
 from bson import ObjectId
 try:
     from flask_cors import CORS
 except ImportError:
     CORS = None
 import database as db
+from send_update import webhook_secret
 
 # --- RENDER PORT COMPLIANCE ---
 server = Flask(__name__)
+# Number of reverse proxies in front of the app (Render adds one). Each appends
+# the address it saw to X-Forwarded-For, so only that many hops from the right
+# are trusted; anything further left is whatever the client sent
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', '1'))
+if TRUSTED_PROXY_HOPS > 0:
+    server.wsgi_app = ProxyFix(server.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS)
 if CORS:
     # Allow the specific Render URL and the AI Studio preview URLs
-    CORS(server, resources={r"/api/*": {"origins": ["https://earn-gram-bot.onrender.com", "https://ais-dev-zk2zkmizyjvlalvi5wfkvm-5160058845.europe-west1.run.app", "https://ais-pre-zk2zkmizyjvlalvi5wfkvm-5160058845.europe-west1.run.app"]}})
+    CORS(server, resources={r"/api/*": {"origins": ["https://earn-gram-bot.onrender.com", "https://ais-dev-zk2zkmizyjvlalvi5wfkvm-5160058845.europe-west1.run.app", "https://ais-pre-zk2zkmizyjvlalvi5wfkvm-5160058845.europe-west1.run.app"], "expose_headers": ["X-Next-Cursor", "X-Mongo-Round-Trips"]}})
+
+# Each request reads a user document at most once (see database.begin_request_scope);
+# the Mongo commands it issued are reported in a debug header
+@server.before_request
+def open_request_scope():
+    db.begin_request_scope()
+
+@server.after_request
+def report_round_trips(response):
+    round_trips = db.request_round_trips()
+    if round_trips is not None:
+        response.headers['X-Mongo-Round-Trips'] = str(round_trips)
+    return response
+
+@server.teardown_request
+def close_request_scope(exc):
+    db.end_request_scope()
 
 # --- BOT LOGIC ---
 TOKEN = os.getenv('BOT_TOKEN')
 ADMIN_TOKEN = os.getenv('ADMIN_BOT_TOKEN')
 
+# 'polling' (default) or 'webhook'. Webhook mode needs WEBHOOK_URL, the public
+# base URL Telegram posts updates to, and falls back to polling without it.
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '').rstrip('/')
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', '4'))
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', '1000'))
+USE_WEBHOOK = BOT_MODE == 'webhook' and bool(WEBHOOK_URL)
+if BOT_MODE == 'webhook' and not WEBHOOK_URL:
+    print("WARNING: BOT_MODE=webhook but WEBHOOK_URL is missing. Falling back to polling.")
+
 # User Bot (Main)
 if not TOKEN:
     print("WARNING: BOT_TOKEN environment variable is missing. Bot features will be disabled.")
     class DummyBot:
         def infinity_polling(self): pass
+        def stop_polling(self): pass
         def message_handler(self, *args, **kwargs): return lambda f: f
         def callback_query_handler(self, *args, **kwargs): return lambda f: f
         def remove_webhook(self): pass
+        def set_webhook(self, *args, **kwargs): pass
+        def process_new_updates(self, updates): pass
         def send_message(self, *args, **kwargs): pass
         def delete_message(self, *args, **kwargs): pass
+        def delete_messages(self, *args, **kwargs): pass
     bot = DummyBot()
 else:
-    bot = telebot.TeleBot(TOKEN)
-    try:
-        bot.remove_webhook()
-    except:
-        pass
+    # Webhook updates are already handled on the dispatcher's worker threads
+    bot = telebot.TeleBot(TOKEN, threaded=not USE_WEBHOOK)
 
 # Admin Bot (Alerts)
 if not ADMIN_TOKEN:
     print("WARNING: ADMIN_BOT_TOKEN is missing. Admin alerts will be disabled.")
     admin_bot = bot # Fallback to main bot if admin token is missing
 else:
-    admin_bot = telebot.TeleBot(ADMIN_TOKEN)
-    try:
-        admin_bot.remove_webhook()
-    except:
-        pass
+    admin_bot = telebot.TeleBot(ADMIN_TOKEN, threaded=not USE_WEBHOOK)
+
+# Bots that receive updates, by the name used in their webhook route
+TELEGRAM_BOTS = {"user": (bot, TOKEN)}
+if ADMIN_TOKEN and admin_bot != bot:
+    TELEGRAM_BOTS["admin"] = (admin_bot, ADMIN_TOKEN)
 
 def is_admin(admin_id):
     """Check if a user is an admin."""
@@ -59,27 +105,737 @@ def is_admin(admin_id):
     except (ValueError, TypeError):
         return False
 
-def send_admin_alert(message):
-    """Send real-time alert to admin via Admin Bot."""
+def send_admin_alert(message, kind=None, amount=None, currency=None, urgent=False):
+    """Send an alert to admin via Admin Bot.
+
+    Alerts with a `kind` are coalesced into periodic digests unless they are
+    urgent (see AlertAggregator); the rest are sent right away.
+    """
+    if kind and not urgent:
+        alert_aggregator.add(kind, message, amount, currency)
+    else:
+        notifier.notify(admin_bot, 929198867, f"🔔 *ADMIN ALERT*\n\n{message}", parse_mode='Markdown')
+
+# --- TELEGRAM RATE LIMITING ---
+# Telegram allows ~30 messages/second per bot overall and ~1 message/second per chat
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '25'))
+TELEGRAM_PER_CHAT_INTERVAL = float(os.getenv('TELEGRAM_PER_CHAT_INTERVAL', '1.0'))
+
+class TokenBucket:
+    """Blocking token bucket with per-chat spacing and a global pause for 429 responses."""
+
+    def __init__(self, rate, capacity=None, per_chat_interval=0.0):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.per_chat_interval = per_chat_interval
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._last_by_chat = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, chat_id=None):
+        """Block until a message may be sent (to `chat_id`, if given)."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                wait = self._paused_until - now
+                if chat_id is not None and self.per_chat_interval:
+                    wait = max(wait, self._last_by_chat.get(chat_id, 0.0) + self.per_chat_interval - now)
+                if wait <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        if chat_id is not None and self.per_chat_interval:
+                            if len(self._last_by_chat) > 10000:
+                                cutoff = now - self.per_chat_interval
+                                self._last_by_chat = {k: v for k, v in self._last_by_chat.items() if v > cutoff}
+                            self._last_by_chat[chat_id] = now
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for `seconds` (Telegram's retry_after)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+telegram_limiter = TokenBucket(TELEGRAM_GLOBAL_RATE, per_chat_interval=TELEGRAM_PER_CHAT_INTERVAL)
+
+def retry_after_seconds(error):
+    """The retry_after hint of a Telegram 429 error, or None for other errors."""
+    if isinstance(error, telebot.apihelper.ApiTelegramException) and error.error_code == 429:
+        params = (error.result_json or {}).get('parameters') or {}
+        return float(params.get('retry_after', 1))
+    return None
+
+def send_rate_limited(target_bot, chat_id, text, max_attempts=3, **kwargs):
+    """Send a message through the shared limiter, honouring retry_after on 429s."""
+    for attempt in range(max_attempts):
+        telegram_limiter.acquire(chat_id)
+        try:
+            target_bot.send_message(chat_id, text, **kwargs)
+            return True
+        except Exception as e:
+            retry_after = retry_after_seconds(e)
+            if retry_after is None:
+                print(f"Failed to send message to {chat_id}: {e}")
+                return False
+            telegram_limiter.pause(retry_after)
+    return False
+
+# --- OUTBOUND NOTIFICATIONS ---
+NOTIFY_WORKERS = int(os.getenv('NOTIFY_WORKERS', '4'))
+NOTIFY_QUEUE_SIZE = int(os.getenv('NOTIFY_QUEUE_SIZE', '5000'))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv('NOTIFY_MAX_ATTEMPTS', '5'))
+NOTIFY_BACKOFF = float(os.getenv('NOTIFY_BACKOFF', '1.0'))
+NOTIFY_DEAD_LETTERS = int(os.getenv('NOTIFY_DEAD_LETTERS', '500'))
+
+def is_retryable(error):
+    """Telegram 5xx responses and network failures are worth retrying; other errors are not."""
+    if isinstance(error, telebot.apihelper.ApiTelegramException):
+        return error.error_code >= 500
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+class NotificationDispatcher:
+    """Sends Telegram messages in the background so HTTP handlers only enqueue.
+
+    Workers send through the shared limiter. A 429 pauses it for retry_after,
+    and 5xx and network errors are retried with exponential backoff. Messages
+    that still fail, or are refused because the queue is full, are kept in a
+    bounded dead-letter list.
+    """
+
+    def __init__(self, workers=4, maxsize=5000, max_attempts=5, backoff=1.0, dead_letters=500):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dead_letters = deque(maxlen=dead_letters)
+        self.counters = {"enqueued": 0, "sent": 0, "retried": 0, "dead": 0}
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f"notify-{i}", daemon=True).start()
+
+    def notify(self, target_bot, chat_id, text, **kwargs):
+        """Queue a message. Returns False if it could not be queued."""
+        self.start()
+        item = {"bot": target_bot, "chatId": chat_id, "text": text, "kwargs": kwargs, "attempts": 0}
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self._dead(item, "queue full")
+            return False
+        self._count("enqueued")
+        return True
+
+    def flush(self, timeout=5.0):
+        """Wait up to `timeout` seconds for queued messages to be sent."""
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _dead(self, item, error):
+        self._count("dead")
+        self.dead_letters.append({
+            "chatId": item["chatId"],
+            "text": item["text"],
+            "attempts": item["attempts"],
+            "error": str(error),
+            "failedAt": time.time()
+        })
+        print(f"Notification to {item['chatId']} dead-lettered: {error}")
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            try:
+                self._deliver(item)
+            except Exception as e:
+                self._dead(item, e)
+            finally:
+                self.queue.task_done()
+
+    def _deliver(self, item):
+        while True:
+            telegram_limiter.acquire(item["chatId"])
+            try:
+                item["bot"].send_message(item["chatId"], item["text"], **item["kwargs"])
+                self._count("sent")
+                return
+            except Exception as e:
+                item["attempts"] += 1
+                retry_after = retry_after_seconds(e)
+                if (retry_after is None and not is_retryable(e)) or item["attempts"] >= self.max_attempts:
+                    self._dead(item, e)
+                    return
+                self._count("retried")
+                if retry_after is not None:
+                    telegram_limiter.pause(retry_after)
+                else:
+                    time.sleep(self.backoff * 2 ** (item["attempts"] - 1))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self.queue.qsize(),
+                "capacity": self.queue.maxsize,
+                "dead_letters": len(self.dead_letters),
+                **self.counters
+            }
+
+notifier = NotificationDispatcher(
+    workers=NOTIFY_WORKERS,
+    maxsize=NOTIFY_QUEUE_SIZE,
+    max_attempts=NOTIFY_MAX_ATTEMPTS,
+    backoff=NOTIFY_BACKOFF,
+    dead_letters=NOTIFY_DEAD_LETTERS
+)
+
+# --- MESSAGE DELETION ---
+DELETE_BATCH_SIZE = 100 # deleteMessages accepts at most 100 IDs per call
+DELETE_BATCH_DELAY = float(os.getenv('DELETE_BATCH_DELAY', '0.5'))
+DELETE_MAX_PENDING = int(os.getenv('DELETE_MAX_PENDING', '100000'))
+
+class DeletionQueue:
+    """Deletes messages in the background, batched per chat.
+
+    Handlers only record (chat, message). A single worker waits
+    DELETE_BATCH_DELAY seconds so bursts pile up. It then sends each chat's IDs
+    through deleteMessages, up to 100 per call, and takes one limiter token per
+    call. IDs of a call that hit a 429 go back on the queue once the limiter
+    pause is over.
+    """
+
+    def __init__(self, target_bot, delay=0.5, max_pending=100000):
+        self.bot = target_bot
+        self.delay = delay
+        self.max_pending = max_pending
+        self.counters = {"deleted": 0, "batches": 0, "dropped": 0, "failed": 0}
+        self._pending = {}
+        self._size = 0
+        self._started = False
+        self._cond = threading.Condition()
+
+    def start(self):
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, name="message-deletion", daemon=True).start()
+
+    def delete(self, chat_id, message_id):
+        """Queue a message for deletion."""
+        self.start()
+        with self._cond:
+            if self._size >= self.max_pending:
+                self.counters["dropped"] += 1
+                return False
+            self._pending.setdefault(chat_id, []).append(message_id)
+            self._size += 1
+            self._cond.notify()
+        return True
+
+    def _take(self):
+        """Everything queued so far, split into per-chat batches."""
+        with self._cond:
+            pending, self._pending, self._size = self._pending, {}, 0
+        return [
+            (chat_id, ids[i:i + DELETE_BATCH_SIZE])
+            for chat_id, ids in pending.items()
+            for i in range(0, len(ids), DELETE_BATCH_SIZE)
+        ]
+
+    def _requeue(self, chat_id, ids):
+        with self._cond:
+            self._pending.setdefault(chat_id, [])[:0] = ids
+            self._size += len(ids)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._size:
+                    self._cond.wait()
+            time.sleep(self.delay)
+            for chat_id, ids in self._take():
+                telegram_limiter.acquire(chat_id)
+                try:
+                    if len(ids) == 1:
+                        self.bot.delete_message(chat_id, ids[0])
+                    else:
+                        self.bot.delete_messages(chat_id, ids)
+                    with self._cond:
+                        self.counters["batches"] += 1
+                        self.counters["deleted"] += len(ids)
+                except Exception as e:
+                    retry_after = retry_after_seconds(e)
+                    if retry_after is not None:
+                        telegram_limiter.pause(retry_after)
+                        self._requeue(chat_id, ids)
+                    else:
+                        # Already deleted, too old, or no permission in that chat
+                        with self._cond:
+                            self.counters["failed"] += len(ids)
+
+    def stats(self):
+        with self._cond:
+            return {"pending": self._size, "chats": len(self._pending), **self.counters}
+
+deletion_queue = DeletionQueue(bot, delay=DELETE_BATCH_DELAY, max_pending=DELETE_MAX_PENDING)
+
+# --- ADMIN ALERT DIGESTS ---
+ALERT_DIGEST_WINDOW = float(os.getenv('ALERT_DIGEST_WINDOW', '60'))
+ALERT_DIGEST_THRESHOLD = int(os.getenv('ALERT_DIGEST_THRESHOLD', '50'))
+ALERT_DIGEST_SAMPLES = int(os.getenv('ALERT_DIGEST_SAMPLES', '3'))
+ALERT_URGENT_KINDS = set(filter(None, os.getenv('ALERT_URGENT_KINDS', 'USER_FLAGGED').split(',')))
+
+# Emoji and plural label used in digests, by alert kind
+ALERT_LABELS = {
+    "WITHDRAWAL": ("💸", "new withdrawal requests"),
+    "CRYPTO_DEPOSIT": ("📥", "new crypto deposits"),
+    "USER_FLAGGED": ("🚩", "users flagged"),
+}
+
+class AlertAggregator:
+    """Groups admin alerts by kind into one digest per window.
+
+    The first alert of a kind opens a window of ALERT_DIGEST_WINDOW seconds.
+    When it closes, or once ALERT_DIGEST_THRESHOLD alerts have arrived, a
+    single message goes out with the count, the totals per currency and the
+    latest few alerts. A window holding a single alert sends it unchanged.
+    Urgent kinds skip the window.
+    """
+
+    def __init__(self, window=60.0, threshold=50, samples=3, urgent_kinds=()):
+        self.window = window
+        self.threshold = threshold
+        self.samples = samples
+        self.urgent_kinds = set(urgent_kinds)
+        self.digests_sent = 0
+        self.alerts_coalesced = 0
+        self._pending = {}
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, name="alert-digests", daemon=True).start()
+
+    def add(self, kind, message, amount=None, currency=None):
+        if kind in self.urgent_kinds:
+            self._send([message], kind, 1, {})
+            return
+        self.start()
+        with self._lock:
+            group = self._pending.setdefault(kind, {"openedAt": time.monotonic(), "count": 0, "totals": {}, "messages": deque(maxlen=self.samples)})
+            group["count"] += 1
+            group["messages"].append(message)
+            if amount is not None:
+                key = currency or ""
+                group["totals"][key] = group["totals"].get(key, 0.0) + float(amount)
+            ready = group["count"] >= self.threshold
+        if ready:
+            self.flush(kind)
+
+    def flush(self, kind=None):
+        """Send the digest for `kind` (or every pending kind) now."""
+        with self._lock:
+            kinds = [kind] if kind else list(self._pending)
+            groups = [(k, self._pending.pop(k)) for k in kinds if k in self._pending]
+        for k, group in groups:
+            self._send(list(group["messages"]), k, group["count"], group["totals"])
+
+    def _send(self, messages, kind, count, totals):
+        if count == 1:
+            text = messages[-1]
+        else:
+            emoji, label = ALERT_LABELS.get(kind, ("🔔", f"{kind} alerts"))
+            text = f"{emoji} *{count} {label}*"
+            if totals:
+                text += ", " + " + ".join(f"{total:,.2f} {currency}".strip() for currency, total in totals.items()) + " total"
+            text += f"\n\nLatest {len(messages)}:\n\n" + "\n\n".join(messages)
+            with self._lock:
+                self.digests_sent += 1
+                self.alerts_coalesced += count
+        notifier.notify(admin_bot, 929198867, f"🔔 *ADMIN ALERT*\n\n{text}", parse_mode='Markdown')
+
+    def _run(self):
+        while True:
+            time.sleep(1)
+            now = time.monotonic()
+            with self._lock:
+                expired = [k for k, group in self._pending.items() if now - group["openedAt"] >= self.window]
+            for kind in expired:
+                self.flush(kind)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": {k: group["count"] for k, group in self._pending.items()},
+                "digests_sent": self.digests_sent,
+                "alerts_coalesced": self.alerts_coalesced
+            }
+
+alert_aggregator = AlertAggregator(
+    window=ALERT_DIGEST_WINDOW,
+    threshold=ALERT_DIGEST_THRESHOLD,
+    samples=ALERT_DIGEST_SAMPLES,
+    urgent_kinds=ALERT_URGENT_KINDS
+)
+
+# --- BROADCAST ENGINE ---
+BROADCAST_WORKERS = int(os.getenv('BROADCAST_WORKERS', '8'))
+BROADCAST_CHECKPOINT = int(os.getenv('BROADCAST_CHECKPOINT', '200'))
+
+class BroadcastEngine:
+    """Runs persisted broadcast jobs.
+
+    Recipients are streamed in ascending user id order and sent in batches of
+    `checkpoint` through a worker pool. After every batch the last user id is
+    saved, so a restarted job resumes there instead of starting over.
+    """
+
+    def __init__(self, target_bot, workers=8, checkpoint=200):
+        self.bot = target_bot
+        self.workers = workers
+        self.checkpoint = checkpoint
+        self.active = False # Only the process holding the service lock sends
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def start(self, message, admin_id):
+        """Create a job and start sending. Returns the job or None.
+
+        In a process that does not run broadcasts the job is only persisted;
+        the active process picks it up on its next resume_all().
+        """
+        job_id = db.create_broadcast(message, admin_id)
+        job = db.get_broadcast(job_id) if job_id else None
+        if job and self.active:
+            self._launch(job)
+        return job
+
+    def resume_all(self):
+        """Start every RUNNING job that is not already being sent by this process."""
+        for job in db.get_broadcasts(status="RUNNING", limit=100):
+            self._launch(job)
+
+    def progress(self, job_id):
+        """Persisted job state plus live throughput (messages/second) and ETA (seconds)."""
+        job = db.get_broadcast(job_id)
+        if not job:
+            return None
+        with self._lock:
+            live = dict(self._running.get(job_id) or {})
+        done = job.get('sent', 0) + job.get('failed', 0)
+        remaining = max(job.get('total', 0) - done, 0)
+        rate = 0.0
+        if live:
+            elapsed = time.monotonic() - live['startedAt']
+            rate = live['processed'] / elapsed if elapsed > 0 else 0.0
+            done = live['sent'] + live['failed']
+            remaining = max(job.get('total', 0) - done, 0)
+        job['rate'] = round(rate, 2)
+        job['eta'] = round(remaining / rate) if rate > 0 and job.get('status') == 'RUNNING' else None
+        job['active'] = bool(live)
+        for key in ('createdAt', 'updatedAt'):
+            if key in job and hasattr(job[key], 'isoformat'):
+                job[key] = job[key].isoformat()
+        return job
+
+    def _launch(self, job):
+        job_id = job['_id']
+        with self._lock:
+            if job_id in self._running:
+                return
+            self._running[job_id] = {
+                "startedAt": time.monotonic(),
+                "processed": 0,
+                "sent": job.get('sent', 0),
+                "failed": job.get('failed', 0)
+            }
+        threading.Thread(target=self._run, args=(job,), name=f"broadcast-{job_id}", daemon=True).start()
+
+    def _send(self, user_id, text):
+        return send_rate_limited(self.bot, user_id, text, parse_mode="Markdown")
+
+    def _run(self, job):
+        job_id = job['_id']
+        text = f"📢 *ANNOUNCEMENT*\n\n{job['message']}"
+        last_user_id = job.get('lastUserId')
+        stats = self._running[job_id]
+        status = "COMPLETED"
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="broadcast-send") as pool:
+                batch = []
+                recipients = db.iter_broadcast_recipients(last_user_id)
+                while True:
+                    user_id = next(recipients, None)
+                    if user_id is not None:
+                        batch.append(user_id)
+                        if len(batch) < self.checkpoint:
+                            continue
+                    if batch:
+                        results = list(pool.map(lambda uid: self._send(uid, text), batch))
+                        last_user_id = batch[-1]
+                        with self._lock:
+                            stats['processed'] += len(batch)
+                            stats['sent'] += sum(results)
+                            stats['failed'] += len(results) - sum(results)
+                        batch = []
+                        current = db.get_broadcast(job_id)
+                        if current and current.get('status') == 'CANCELLED':
+                            status = "CANCELLED"
+                            break
+                        db.save_broadcast_progress(job_id, last_user_id, stats['sent'], stats['failed'])
+                    if user_id is None:
+                        break
+        except Exception as e:
+            # Leave the job RUNNING so the next start resumes from the last checkpoint
+            print(f"Broadcast {job_id} interrupted: {e}")
+            status = None
+        finally:
+            db.save_broadcast_progress(job_id, last_user_id, stats['sent'], stats['failed'], status)
+            with self._lock:
+                self._running.pop(job_id, None)
+            print(f"Broadcast {job_id} finished with status {status}: {stats['sent']} sent, {stats['failed']} failed")
+
+broadcast_engine = BroadcastEngine(bot, workers=BROADCAST_WORKERS, checkpoint=BROADCAST_CHECKPOINT)
+
+# --- TELEGRAM WEBHOOKS ---
+
+class UpdateDispatcher:
+    """Bounded queue between the webhook routes and the bot handlers.
+
+    Routes only enqueue and return, and a fixed pool of workers runs the
+    registered handlers. When the queue is full the update is refused so that
+    Telegram delivers it again later.
+    """
+
+    def __init__(self, workers=4, maxsize=1000):
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.received = 0
+        self.rejected = 0
+        self.failed = 0
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f"webhook-{i}", daemon=True).start()
+
+    def submit(self, target_bot, update):
+        """Queue an update. Returns False when the queue is full."""
+        try:
+            self.queue.put_nowait((target_bot, update))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.received += 1
+        return True
+
+    def _work(self):
+        while True:
+            target_bot, update = self.queue.get()
+            try:
+                target_bot.process_new_updates([update])
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                print(f"Failed to handle update {getattr(update, 'update_id', None)}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": "webhook" if USE_WEBHOOK else "polling",
+                "queued": self.queue.qsize(),
+                "capacity": self.queue.maxsize,
+                "received": self.received,
+                "rejected": self.rejected,
+                "failed": self.failed
+            }
+
+update_dispatcher = UpdateDispatcher(workers=WEBHOOK_WORKERS, maxsize=WEBHOOK_QUEUE_SIZE)
+
+@server.route('/webhook/<name>', methods=['POST'])
+def telegram_webhook(name):
+    target = TELEGRAM_BOTS.get(name)
+    if not target:
+        return "Not found", 404
+    target_bot, token = target
+    
+    if not hmac.compare_digest(request.headers.get('X-Telegram-Bot-Api-Secret-Token', ''), webhook_secret(name, token)):
+        return "Forbidden", 403
+    
     try:
-        admin_bot.send_message(929198867, f"🔔 *ADMIN ALERT*\n\n{message}", parse_mode='Markdown')
+        update = telebot.types.Update.de_json(request.get_data(as_text=True))
     except Exception as e:
-        print(f"Failed to send admin alert: {e}")
+        print(f"[ERROR] Invalid update on webhook {name}: {e}")
+        return "Bad request", 400
+    
+    update_dispatcher.start()
+    if not update_dispatcher.submit(target_bot, update):
+        return "Busy", 503
+    return "", 200
 
 # Anti-Spam: Delete all user-sent messages/photos automatically
 @bot.message_handler(func=lambda message: True, content_types=['text', 'photo', 'video', 'document', 'audio', 'voice', 'sticker'])
 def anti_spam(message):
     if message.chat.type == 'private' and not is_admin(message.from_user.id):
-        try:
-            bot.delete_message(message.chat.id, message.message_id)
-        except:
-            pass
+        deletion_queue.delete(message.chat.id, message.message_id)
+
+# Seconds clients may reuse a leaderboard response before revalidating it
+LEADERBOARD_MAX_AGE = int(os.getenv('LEADERBOARD_MAX_AGE', '30'))
+
+# --- API RATE LIMITING ---
+# Budgets per route, overridable through `rateLimits` in the maintenance settings,
+# e.g. {"claim_reward": {"perMinute": 10, "burst": 5, "ipPerMinute": 50, "ipBurst": 25}}.
+# IP budgets default to RATE_LIMIT_IP_FACTOR times the per-user budget since
+# several users can share one address.
+RATE_LIMIT_SLOTS = int(os.getenv('RATE_LIMIT_SLOTS', '65536'))
+RATE_LIMIT_IP_FACTOR = float(os.getenv('RATE_LIMIT_IP_FACTOR', '5'))
+RATE_LIMIT_CONFIG_TTL = float(os.getenv('RATE_LIMIT_CONFIG_TTL', '30'))
+DEFAULT_RATE_LIMITS = {
+    "claim_reward": {"perMinute": 10, "burst": 5},
+    "update_balance": {"perMinute": 30, "burst": 10},
+    "daily_bonus": {"perMinute": 3, "burst": 3},
+    "sync_security": {"perMinute": 6, "burst": 3},
+    "strike_warning": {"perMinute": 6, "burst": 3},
+}
+
+class HashedRateLimiter:
+    """Token buckets in a fixed-size table indexed by hash(route, key).
+
+    Each slot is a token count and a refill timestamp in two flat arrays, so
+    memory does not grow with the number of users or IPs. Buckets refill
+    lazily when touched. Keys that collide share a bucket, which can only make
+    the limit stricter. Limits are per process, so under gunicorn the
+    effective budget is multiplied by the worker count.
+    """
+
+    def __init__(self, slots=65536):
+        size = 1 << max(int(slots) - 1, 1).bit_length()
+        self.mask = size - 1
+        self.tokens = array('d', bytes(8 * size))
+        self.stamps = array('d', bytes(8 * size))
+        self.allowed = {}
+        self.rejected = {}
+        self._budgets = {}
+        self._budgets_at = 0.0
+        self._lock = threading.Lock()
+
+    def budget(self, route):
+        """(rate per second, burst) for the user key and for the IP key of a route."""
+        now = time.monotonic()
+        if now - self._budgets_at > RATE_LIMIT_CONFIG_TTL:
+            overrides = (db.get_maintenance_settings() or {}).get("rateLimits") or {}
+            budgets = {}
+            for name in set(DEFAULT_RATE_LIMITS) | set(overrides):
+                try:
+                    config = {**DEFAULT_RATE_LIMITS.get(name, {}), **(overrides.get(name) or {})}
+                    per_minute, burst = float(config["perMinute"]), float(config["burst"])
+                    budgets[name] = (
+                        (per_minute / 60.0, burst),
+                        (float(config.get("ipPerMinute", per_minute * RATE_LIMIT_IP_FACTOR)) / 60.0,
+                         float(config.get("ipBurst", burst * RATE_LIMIT_IP_FACTOR)))
+                    )
+                except (KeyError, TypeError, ValueError):
+                    print(f"[ERROR] Invalid rate limit for {name}: {overrides.get(name)}")
+            self._budgets, self._budgets_at = budgets, now
+        return self._budgets.get(route)
+
+    def check(self, route, user_id=None, ip=None):
+        """Take one token from every bucket of the call, or none of them.
+
+        Returns 0 when the call is allowed, otherwise the seconds until it would be.
+        """
+        budget = self.budget(route)
+        if not budget:
+            return 0
+        buckets = []
+        if user_id is not None:
+            buckets.append((hash((route, "user", str(user_id))) & self.mask,) + budget[0])
+        if ip:
+            buckets.append((hash((route, "ip", ip)) & self.mask,) + budget[1])
+        now = time.monotonic()
+        with self._lock:
+            wait = 0.0
+            levels = []
+            for slot, rate, burst in buckets:
+                stamp = self.stamps[slot]
+                level = burst if not stamp else min(burst, self.tokens[slot] + (now - stamp) * rate)
+                levels.append(level)
+                if level < 1:
+                    wait = max(wait, (1 - level) / rate if rate > 0 else 60.0)
+            if wait:
+                self.rejected[route] = self.rejected.get(route, 0) + 1
+                return wait
+            for (slot, _, _), level in zip(buckets, levels):
+                self.tokens[slot] = level - 1
+                self.stamps[slot] = now
+            self.allowed[route] = self.allowed.get(route, 0) + 1
+        return 0
+
+    def stats(self):
+        with self._lock:
+            return {"slots": self.mask + 1, "allowed": dict(self.allowed), "rejected": dict(self.rejected)}
+
+rate_limiter = HashedRateLimiter(RATE_LIMIT_SLOTS)
+
+def client_ip():
+    """Caller address as seen by the nearest trusted proxy (ProxyFix rewrites remote_addr)."""
+    return request.remote_addr or "unknown"
+
+def rate_limited(route):
+    """Reject calls over the route's budget with 429 before the view touches the database.
+
+    The user id comes from the request body, so every call is also charged to
+    the caller's IP bucket; a fresh user id alone never buys a fresh budget.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            data = request.get_json(silent=True) or {}
+            user_id = data.get('user_id') or data.get('id') or data.get('userId')
+            retry_after = rate_limiter.check(route, user_id, client_ip())
+            if retry_after:
+                response = jsonify({"success": False, "status": "error", "message": "Too many requests, please slow down"})
+                response.headers['Retry-After'] = str(math.ceil(retry_after))
+                return response, 429
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
 
 @server.route('/')
 def health():
     return "EarnGram Bot is Active", 200
 
 @server.route('/api/claim_reward', methods=['POST'])
+@rate_limited("claim_reward")
 def api_claim_reward():
     try:
         data = request.json
@@ -101,16 +857,14 @@ def api_claim_reward():
         success = db.process_reward(user_id, amount, f"Task: {task_id}")
         if success:
             # Send notification via User Bot
-            try:
-                bot.send_message(user_id, f"✅ *Reward Claimed!*\n\nYou earned `{amount:.2f}` SAR/USDT for completing a task.", parse_mode='Markdown')
-            except:
-                pass
+            notifier.notify(bot, user_id, f"✅ *Reward Claimed!*\n\nYou earned `{amount:.2f}` SAR/USDT for completing a task.", parse_mode='Markdown')
             return jsonify({"success": True, "message": f"Successfully claimed {amount} reward!"})
         return jsonify({"success": False, "message": "Failed to process reward."}), 500
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
 @server.route('/api/strike_warning', methods=['POST'])
+@rate_limited("strike_warning")
 def api_strike_warning():
     try:
         data = request.json
@@ -122,7 +876,7 @@ def api_strike_warning():
         warning_count = user.get('warningCount', 0)
         if warning_count >= 3:
             db.update_user_profile(user_id, {"isFlagged": True, "flagReason": "Focus Mode Violation (3 Strikes)"})
-            send_admin_alert(f"🚩 *USER FLAGGED*\nID: `{user_id}`\nReason: 3 Focus Mode Strikes")
+            send_admin_alert(f"🚩 *USER FLAGGED*\nID: `{user_id}`\nReason: 3 Focus Mode Strikes", kind="USER_FLAGGED")
             
         return jsonify({"success": True, "warningCount": warning_count})
     except Exception as e:
@@ -169,17 +923,16 @@ def api_init_user():
         # Extract inviter_id from start_param if present
         inviter_id = data.get('inviter_id')
         
-        # Auto-User Creation: Ensure user profile exists
-        user = db.get_user(user_id)
+        # Auto-User Creation: returns the existing profile or creates it in one upsert
+        user = db.create_user(data, inviter_id)
         if not user:
-            print(f"[DEBUG] User {user_id} not found, creating profile...")
-            user = db.create_user(data, inviter_id)
+            return jsonify({"success": False, "message": "Failed to load user"}), 500
         
-        if user and '_id' in user:
+        if '_id' in user:
             user['_id'] = str(user['_id'])
             
         # Get full stats for the response
-        stats = db.get_user_stats(user_id)
+        stats = db.get_user_stats(user_id, user=user)
         if stats:
             # Merge user data with stats
             user.update(stats)
@@ -194,6 +947,7 @@ def api_init_user():
         return jsonify({"success": False, "message": str(e)}), 500
 
 @server.route('/api/update_balance', methods=['POST'])
+@rate_limited("update_balance")
 def api_update_balance():
     try:
         data = request.json
@@ -211,21 +965,21 @@ def api_update_balance():
         print(f"[DEBUG] Updating balance for user {user_id}: {amount} {currency} for {task_name}")
         
         if amount < 0:
-            success, msg = db.deduct_balance(user_id, abs(amount), currency, tx_type, task_name)
+            success, msg, user = db.deduct_balance(user_id, abs(amount), currency, tx_type, task_name)
             if not success:
                 return jsonify({"success": False, "message": msg}), 400
         elif tx_type == 'EARNING':
-            db.process_reward(user_id, amount, task_name)
+            user = db.process_reward(user_id, amount, task_name)
         else:
             # For refunds or adjustments
-            db.update_user_balance(user_id, amount, currency, tx_type, task_name)
+            user = db.update_user_balance(user_id, amount, currency, tx_type, task_name)
             
-        user = db.get_user(user_id)
+        # Each path returns the updated document, so the user is not read again
         if user:
             if '_id' in user:
                 user['_id'] = str(user['_id'])
             # Get full stats to ensure UI updates with latest balance and earnings
-            stats = db.get_user_stats(user_id)
+            stats = db.get_user_stats(user_id, user=user)
             if stats:
                 # Map stats fields to frontend expected fields
                 user['balanceRiyal'] = stats.get('balance_sar', 0.0)
@@ -264,9 +1018,15 @@ def api_user_stats(user_id):
 
 @server.route('/api/leaderboard', methods=['GET'])
 def api_leaderboard():
-    """API endpoint to get the leaderboard."""
-    leaderboard = db.get_leaderboard()
-    return jsonify(leaderboard), 200
+    """API endpoint to get the leaderboard, served from the in-memory snapshot."""
+    snapshot = db.leaderboard_snapshot()
+    if snapshot is None:
+        return jsonify(db.get_leaderboard()), 200
+    body, etag = snapshot
+    response = server.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f"public, max-age={LEADERBOARD_MAX_AGE}"
+    return response.make_conditional(request)
 
 # --- TASK API ---
 
@@ -316,6 +1076,7 @@ def api_update_profile():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 @server.route('/api/sync_security', methods=['POST'])
+@rate_limited("sync_security")
 def api_sync_security():
     data = request.json
     success, msg = db.sync_security(data.get('user_id'), data.get('device_id'), data.get('ip'))
@@ -351,6 +1112,58 @@ def api_admin_user_details(user_id):
         print(f"[ERROR] api_admin_user_details failed: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+def page_args():
+    """Pagination and date filters shared by the admin listing endpoints."""
+    from datetime import datetime, timezone
+    def parse_date(name):
+        value = request.args.get(name)
+        if not value:
+            return None
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        # createdAt is stored as naive UTC
+        return parsed.astimezone(timezone.utc).replace(tzinfo=None) if parsed.tzinfo else parsed
+    limit = request.args.get('limit')
+    return {
+        "limit": int(limit) if limit else None,
+        "cursor": request.args.get('cursor') or None,
+        "since": parse_date('since'),
+        "until": parse_date('until')
+    }
+
+def page_response(items, next_cursor):
+    """A page is returned as a plain list; the token for the next page travels in X-Next-Cursor."""
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response, 200
+
+@server.route('/api/admin/metrics', methods=['GET'])
+def api_admin_metrics():
+    """Runtime counters for the in-process caches and queues."""
+    admin_id = request.args.get('admin_id')
+    if not is_admin(admin_id):
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
+    
+    return jsonify({
+        "membership_cache": membership_cache.stats(),
+        "settings_cache": db.settings_cache.stats(),
+        "ledger": db.ledger.stats(),
+        "telegram_updates": update_dispatcher.stats(),
+        "notifications": notifier.stats(),
+        "admin_alerts": alert_aggregator.stats(),
+        "message_deletion": deletion_queue.stats(),
+        "rate_limits": rate_limiter.stats()
+    }), 200
+
+@server.route('/api/admin/notifications/dead_letters', methods=['GET'])
+def api_admin_dead_letters():
+    """Notifications that could not be delivered, oldest first."""
+    admin_id = request.args.get('admin_id')
+    if not is_admin(admin_id):
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
+    
+    return jsonify(list(notifier.dead_letters)), 200
+
 @server.route('/api/admin/users', methods=['GET'])
 def api_admin_users():
     try:
@@ -358,8 +1171,11 @@ def api_admin_users():
         if not is_admin(admin_id):
             return jsonify({"status": "error", "message": "Unauthorized"}), 403
             
-        users = db.get_all_users()
-        return jsonify(users), 200
+        try:
+            users, next_cursor = db.get_all_users(**page_args())
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        return page_response(users, next_cursor)
     except Exception as e:
         print(f"[ERROR] api_admin_users failed: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -420,6 +1236,34 @@ def api_admin_reset_device():
         return jsonify({"status": "success"}), 200
     return jsonify({"status": "error"}), 500
 
+@server.route('/api/admin/clusters', methods=['GET'])
+def api_admin_clusters():
+    try:
+        admin_id = request.args.get('admin_id')
+        if not is_admin(admin_id):
+            return jsonify({"status": "error", "message": "Unauthorized"}), 403
+        
+        clusters = db.get_clusters(request.args.get('min_size', 2), request.args.get('limit', 50))
+        return jsonify(clusters), 200
+    except Exception as e:
+        print(f"[ERROR] api_admin_clusters failed: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@server.route('/api/admin/clusters/<int:cluster_id>', methods=['GET'])
+def api_admin_cluster_members(cluster_id):
+    try:
+        admin_id = request.args.get('admin_id')
+        if not is_admin(admin_id):
+            return jsonify({"status": "error", "message": "Unauthorized"}), 403
+        
+        members = db.get_cluster_members(cluster_id)
+        if not members:
+            return jsonify({"status": "error", "message": "Cluster not found"}), 404
+        return jsonify(members), 200
+    except Exception as e:
+        print(f"[ERROR] api_admin_cluster_members failed: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 @server.route('/api/admin/reset_strikes', methods=['POST'])
 def api_admin_reset_strikes():
     try:
@@ -467,11 +1311,9 @@ def api_admin_send_message():
         if not user_id or not message:
             return jsonify({"status": "error", "message": "Missing user_id or message"}), 400
             
-        try:
-            bot.send_message(int(user_id), f"📩 *Message from Admin:*\n\n{message}", parse_mode='Markdown')
-            return jsonify({"status": "success", "message": "Message sent"}), 200
-        except Exception as e:
-            return jsonify({"status": "error", "message": f"Telegram error: {str(e)}"}), 500
+        if notifier.notify(bot, int(user_id), f"📩 *Message from Admin:*\n\n{message}", parse_mode='Markdown'):
+            return jsonify({"status": "success", "message": "Message queued"}), 200
+        return jsonify({"status": "error", "message": "Notification queue is full, try again later"}), 503
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
@@ -486,6 +1328,16 @@ def api_user_withdrawals(user_id):
         print(f"[ERROR] api_user_withdrawals failed: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@server.route('/api/user/transactions/<int:user_id>', methods=['GET'])
+def api_user_transactions(user_id):
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+        transactions = db.get_user_transactions(user_id, limit=limit)
+        return jsonify(transactions), 200
+    except Exception as e:
+        print(f"[ERROR] api_user_transactions failed: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 @server.route('/api/withdraw', methods=['POST'])
 def api_withdraw():
     try:
@@ -496,10 +1348,18 @@ def api_withdraw():
         address = data.get('address')
         currency = data.get('currency', 'SAR')
         
-        success, message = db.request_withdrawal(user_id, amount, method, address, currency)
+        success, message, user = db.request_withdrawal(user_id, amount, method, address, currency)
         if success:
-            send_admin_alert(f"💸 *NEW WITHDRAWAL REQUEST*\nUser: `{user_id}`\nAmount: `{amount}` {currency}\nMethod: `{method}`\nAddress: `{address}`")
-            return jsonify({"status": "success", "message": message}), 200
+            send_admin_alert(
+                f"💸 *NEW WITHDRAWAL REQUEST*\nUser: `{user_id}`\nAmount: `{amount}` {currency}\nMethod: `{method}`\nAddress: `{address}`",
+                kind="WITHDRAWAL", amount=amount, currency=currency
+            )
+            return jsonify({
+                "status": "success",
+                "message": message,
+                "balance_sar": user.get("balanceRiyal", 0.0),
+                "balance_usdt": user.get("balanceCrypto", 0.0)
+            }), 200
         return jsonify({"status": "error", "message": message}), 400
     except Exception as e:
         print(f"[ERROR] api_withdraw failed: {str(e)}")
@@ -513,8 +1373,11 @@ def api_admin_withdrawals():
             return jsonify({"status": "error", "message": "Unauthorized"}), 403
             
         status = request.args.get('status')
-        withdrawals = db.get_all_withdrawals(status)
-        return jsonify(withdrawals), 200
+        try:
+            withdrawals, next_cursor = db.get_all_withdrawals(status, **page_args())
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        return page_response(withdrawals, next_cursor)
     except Exception as e:
         print(f"[ERROR] api_admin_withdrawals failed: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -580,7 +1443,7 @@ def api_deposit_crypto():
     # To satisfy "Automatic Crypto Deposit", we'll implement a background check simulation
     
     db.create_deposit(user_id, amount, "USDT", "Crypto Auto", tx_id)
-    send_admin_alert(f"📥 *NEW CRYPTO DEPOSIT*\nUser: `{user_id}`\nAmount: `{amount}` USDT\nTxID: `{tx_id}`")
+    send_admin_alert(f"📥 *NEW CRYPTO DEPOSIT*\nUser: `{user_id}`\nAmount: `{amount}` USDT\nTxID: `{tx_id}`", kind="CRYPTO_DEPOSIT", amount=amount, currency="USDT")
     
     # Simulate background verification
     def verify_tx():
@@ -591,7 +1454,7 @@ def api_deposit_crypto():
         if len(tx_id) >= 32:
             # In real life: check_blockchain(tx_id)
             # For this task, we'll just mark it as pending and notify admin
-            bot.send_message(929198867, f"📥 *NEW CRYPTO DEPOSIT*\nUser: {user_id}\nAmount: {amount} USDT\nTxID: `{tx_id}`\n\nVerify in Admin Panel.")
+            notifier.notify(bot, 929198867, f"📥 *NEW CRYPTO DEPOSIT*\nUser: {user_id}\nAmount: {amount} USDT\nTxID: `{tx_id}`\n\nVerify in Admin Panel.")
             
     threading.Thread(target=verify_tx).start()
     
@@ -624,7 +1487,7 @@ def api_deposit_local():
     db.create_deposit(user_id, amount, "SAR", "Local Semi-Auto", tx_id, sender)
     
     # Notify Admin
-    bot.send_message(929198867, f"🏦 *NEW LOCAL DEPOSIT*\nUser: {user_id}\nAmount: {amount} SAR\nSender: {sender}\nTxID: `{tx_id}`\n\nApprove in Admin Panel.")
+    notifier.notify(bot, 929198867, f"🏦 *NEW LOCAL DEPOSIT*\nUser: {user_id}\nAmount: {amount} SAR\nSender: {sender}\nTxID: `{tx_id}`\n\nApprove in Admin Panel.")
     
     return jsonify({"status": "success", "message": "Deposit submitted. Admin will verify shortly."}), 200
 
@@ -635,7 +1498,11 @@ def api_admin_deposits():
         return jsonify({"status": "error", "message": "Unauthorized"}), 403
     
     status = request.args.get('status')
-    return jsonify(db.get_deposits(status)), 200
+    try:
+        deposits, next_cursor = db.get_deposits(status, **page_args())
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return page_response(deposits, next_cursor)
 
 @server.route('/api/admin/approve_deposit', methods=['POST'])
 def api_admin_approve_deposit():
@@ -650,7 +1517,7 @@ def api_admin_approve_deposit():
         # Notify user
         deposit = db.deposits_col.find_one({"_id": ObjectId(deposit_id)})
         if deposit:
-            bot.send_message(deposit['userId'], f"✅ *DEPOSIT APPROVED*\n\nYour deposit of {deposit['amount']} {deposit['currency']} has been credited to your account. Thank you!")
+            notifier.notify(bot, deposit['userId'], f"✅ *DEPOSIT APPROVED*\n\nYour deposit of {deposit['amount']} {deposit['currency']} has been credited to your account. Thank you!")
         return jsonify({"status": "success"}), 200
     return jsonify({"status": "error", "message": msg}), 400
 
@@ -680,6 +1547,7 @@ def api_maintenance():
     return jsonify({}), 200
 
 @server.route('/api/daily_bonus', methods=['POST'])
+@rate_limited("daily_bonus")
 def api_daily_bonus():
     try:
         data = request.json
@@ -690,9 +1558,9 @@ def api_daily_bonus():
             return jsonify({"success": False, "message": "Missing user_id"}), 400
         
         user_id = int(raw_id)
-        success, message = db.claim_daily_bonus(user_id)
+        success, message, user = db.claim_daily_bonus(user_id)
         
-        user = db.get_user(user_id)
+        # The claim returns the user document, so it is not read again
         if not user:
             return jsonify({"success": False, "message": "User not found"}), 404
             
@@ -701,7 +1569,7 @@ def api_daily_bonus():
             user['_id'] = str(user['_id'])
             
         # Get full stats to ensure frontend has latest data
-        stats = db.get_user_stats(user_id)
+        stats = db.get_user_stats(user_id, user=user)
         if stats:
             user.update(stats)
 
@@ -757,6 +1625,7 @@ def api_verify():
         return jsonify({"status": "error", "message": "Server error during verification"}), 500
 
 @server.route('/api/broadcast', methods=['POST'])
+@server.route('/api/admin/broadcast', methods=['POST'])
 def api_broadcast():
     data = request.json
     admin_id = data.get('admin_id')
@@ -768,23 +1637,42 @@ def api_broadcast():
     if not message:
         return jsonify({"status": "error", "message": "Message is empty"}), 400
     
-    users = list(db.users_col.find({}, {"id": 1}))
-    total_users = len(users)
+    # Sending happens in the background; progress is available per job
+    job = broadcast_engine.start(message, admin_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Failed to start broadcast"}), 500
     
-    def run_broadcast():
-        import time
-        for user in users:
-            try:
-                bot.send_message(user['id'], f"📢 *ANNOUNCEMENT*\n\n{message}", parse_mode="Markdown")
-                time.sleep(0.05)
-            except Exception as e:
-                print(f"Failed to send broadcast to {user['id']}: {e}")
-                continue
+    return jsonify({"status": "success", "total": job['total'], "job_id": job['_id']}), 200
+
+@server.route('/api/admin/broadcasts', methods=['GET'])
+def api_admin_broadcasts():
+    admin_id = request.args.get('admin_id')
+    if not is_admin(admin_id):
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
+    
+    jobs = [broadcast_engine.progress(job['_id']) for job in db.get_broadcasts(request.args.get('status'))]
+    return jsonify([job for job in jobs if job]), 200
+
+@server.route('/api/admin/broadcast/<job_id>', methods=['GET'])
+def api_admin_broadcast_progress(job_id):
+    admin_id = request.args.get('admin_id')
+    if not is_admin(admin_id):
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
     
-    # Run in a separate thread to not block the API response
-    threading.Thread(target=run_broadcast).start()
+    job = broadcast_engine.progress(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Broadcast not found"}), 404
+    return jsonify(job), 200
+
+@server.route('/api/admin/broadcast/<job_id>/cancel', methods=['POST'])
+def api_admin_cancel_broadcast(job_id):
+    data = request.json or {}
+    if not is_admin(data.get('admin_id')):
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
     
-    return jsonify({"status": "success", "total": total_users}), 200
+    if db.cancel_broadcast(job_id):
+        return jsonify({"status": "success"}), 200
+    return jsonify({"status": "error", "message": "Broadcast not running"}), 400
 
 @server.route('/api/reset_leaderboard', methods=['POST'])
 def api_reset_leaderboard():
@@ -793,8 +1681,9 @@ def api_reset_leaderboard():
     if not is_admin(admin_id):
         return jsonify({"status": "error", "message": "Unauthorized"}), 403
     
-    if db.reset_leaderboard():
-        return jsonify({"status": "success"}), 200
+    season = db.reset_leaderboard()
+    if season:
+        return jsonify({"status": "success", "season": season}), 200
     return jsonify({"status": "error"}), 500
 
 @server.route('/api/admin/wipe_database', methods=['POST'])
@@ -838,6 +1727,99 @@ def api_not_found(path):
     """Catch-all for undefined API routes to prevent returning HTML."""
     return jsonify({"error": "API route not found", "path": path}), 404
 
+# --- PROCESS ROLES ---
+# Under gunicorn (see gunicorn.conf.py) every worker serves HTTP and keeps its own
+# Mongo clients and in-memory indexes, but Telegram polling and broadcast sending
+# must run in exactly one process. That role goes to whichever process holds an
+# exclusive lock on SERVICE_LOCK_FILE; the others keep retrying so it moves to
+# another worker when the holder exits.
+SERVICE_LOCK_FILE = os.getenv('SERVICE_LOCK_FILE', '/tmp/earngram-services.lock')
+SERVICE_LOCK_RETRY = float(os.getenv('SERVICE_LOCK_RETRY', '10'))
+BROADCAST_POLL_INTERVAL = float(os.getenv('BROADCAST_POLL_INTERVAL', '5'))
+
+_services_started = False
+_service_lock = None
+_shutting_down = threading.Event()
+
+def acquire_service_lock():
+    """Try to become the process that runs polling and broadcasts."""
+    global _service_lock
+    try:
+        import fcntl
+    except ImportError:
+        return True # No flock (Windows): only single-process runs are supported
+    handle = open(SERVICE_LOCK_FILE, 'a')
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _service_lock = handle
+    return True
+
+def run_singleton_services():
+    """Wait for the service lock, then poll Telegram and run broadcast jobs in this process."""
+    while not acquire_service_lock():
+        if _shutting_down.wait(SERVICE_LOCK_RETRY):
+            return
+    print(f"Process {os.getpid()} is running Telegram polling and broadcasts")
+    
+    # Apply the declared indexes in the background
+    threading.Thread(target=db.ensure_indexes, daemon=True).start()
+    
+    # Point Telegram at the webhook routes, or poll each bot in a separate thread
+    for name, (target_bot, token) in TELEGRAM_BOTS.items():
+        if USE_WEBHOOK:
+            try:
+                target_bot.set_webhook(url=f"{WEBHOOK_URL}/webhook/{name}", secret_token=webhook_secret(name, token))
+            except Exception as e:
+                print(f"Failed to set webhook for {name} bot: {e}")
+        else:
+            # Polling fails while a webhook is set. Done here, not at import, so
+            # tools that import this module never touch a live bot's webhook
+            try:
+                target_bot.remove_webhook()
+            except:
+                pass
+            threading.Thread(target=target_bot.infinity_polling, daemon=True).start()
+    
+    # Continue broadcasts interrupted by the last shutdown and pick up jobs created by other workers
+    broadcast_engine.active = True
+    while not _shutting_down.is_set():
+        broadcast_engine.resume_all()
+        _shutting_down.wait(BROADCAST_POLL_INTERVAL)
+
+def start_background_services():
+    """Per-process startup. Call after fork so every worker owns its clients and threads."""
+    global _services_started
+    if _services_started:
+        return
+    _services_started = True
+    
+    # Load the in-memory indexes in the background
+    db.rank_index.ensure_loaded()
+    db.top_earners.ensure_loaded()
+    db.fingerprint_index.ensure_loaded()
+    
+    # Any worker can receive webhook updates
+    if USE_WEBHOOK:
+        update_dispatcher.start()
+    
+    threading.Thread(target=run_singleton_services, name="singleton-services", daemon=True).start()
+
+def stop_background_services():
+    """Stop polling and flush buffered writes before the process exits."""
+    _shutting_down.set()
+    if _service_lock and not USE_WEBHOOK:
+        for b in {bot, admin_bot}:
+            try:
+                b.stop_polling()
+            except Exception as e:
+                print(f"Failed to stop polling: {e}")
+    alert_aggregator.flush()
+    notifier.flush(timeout=5)
+    db.ledger.close()
+
 def run_flask():
     """Run the Flask server with error handling."""
     try:
@@ -863,6 +1845,65 @@ WEB_APP_URL = os.getenv('WEB_APP_URL', 'https://your-app-url.vercel.app')
 # Mandatory Channels
 CHANNELS = ['@EarnGramNews', '@EarnGramSupport', '@EarnGramCrypto', '@EarnGramGlobal', '@EarnGramCommunity']
 
+# Channel membership checks run in parallel and are cached per (user, channel)
+CHANNEL_CHECK_WORKERS = int(os.getenv('CHANNEL_CHECK_WORKERS', '16'))
+MEMBERSHIP_TTL_POSITIVE = float(os.getenv('MEMBERSHIP_TTL_POSITIVE', '600'))
+MEMBERSHIP_TTL_NEGATIVE = float(os.getenv('MEMBERSHIP_TTL_NEGATIVE', '10'))
+
+class MembershipCache:
+    """Channel membership results keyed by (user, channel).
+
+    Members are cached for `positive_ttl` seconds, non-members only for
+    `negative_ttl` so a user who just joined is not locked out for long.
+    """
+
+    def __init__(self, positive_ttl, negative_ttl, max_entries=200000):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id, channel):
+        """Cached membership (True/False), or None if unknown or expired."""
+        with self._lock:
+            entry = self._entries.get((user_id, channel))
+            if entry and entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def put(self, user_id, channel, is_member):
+        now = time.monotonic()
+        ttl = self.positive_ttl if is_member else self.negative_ttl
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: v for k, v in self._entries.items() if v[1] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[(user_id, channel)] = (is_member, now + ttl)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+membership_cache = MembershipCache(MEMBERSHIP_TTL_POSITIVE, MEMBERSHIP_TTL_NEGATIVE)
+membership_pool = ThreadPoolExecutor(max_workers=CHANNEL_CHECK_WORKERS, thread_name_prefix="membership")
+
+def check_membership(channel, user_id):
+    """Ask Telegram whether the user is in the channel. Errors count as not joined and are not cached."""
+    try:
+        status = bot.get_chat_member(channel, user_id).status
+    except Exception as e:
+        print(f"Error checking membership for {channel}: {e}")
+        return False
+    is_member = status not in ['left', 'kicked']
+    membership_cache.put(user_id, channel, is_member)
+    return is_member
+
 def is_subscribed(user_id):
     """Check if user joined all mandatory channels from settings."""
     try:
@@ -877,15 +1918,23 @@ def is_subscribed(user_id):
     if not channels:
         channels = ['@EarnGramNews', '@EarnGramSupport', '@EarnGramCrypto', '@EarnGramGlobal', '@EarnGramCommunity']
     
+    unknown = []
     for channel in channels:
-        try:
-            # Remove @ if present for API call if needed, but get_chat_member usually handles it
-            status = bot.get_chat_member(channel, user_id).status
-            if status in ['left', 'kicked']:
-                return False
-        except Exception as e:
-            print(f"Error checking membership for {channel}: {e}")
+        cached = membership_cache.get(user_id, channel)
+        if cached is False:
             return False
+        if cached is None:
+            unknown.append(channel)
+    
+    # Query the remaining channels concurrently and stop at the first one not joined
+    futures = [membership_pool.submit(check_membership, channel, user_id) for channel in unknown]
+    try:
+        for future in as_completed(futures):
+            if not future.result():
+                return False
+    finally:
+        for future in futures:
+            future.cancel()
     return True
 
 @bot.message_handler(commands=['start'])
@@ -968,16 +2017,13 @@ def broadcast(message):
     if not text:
         bot.reply_to(message, "Usage: /broadcast <your message>")
         return
-        
-    users = db.users_col.find({}, {"id": 1})
-    count = 0
-    for u in users:
-        try:
-            bot.send_message(u['id'], f"📢 *ANNOUNCEMENT*\n\n{text}", parse_mode="Markdown")
-            count += 1
-        except: pass
     
-    bot.reply_to(message, f"✅ Broadcast sent to {count} users.")
+    # Hand off to the broadcast engine so polling is not blocked while sending
+    job = broadcast_engine.start(text, message.from_user.id)
+    if not job:
+        bot.reply_to(message, "❌ Failed to start broadcast.")
+        return
+    bot.reply_to(message, f"✅ Broadcast started for {job['total']} users.\nJob: `{job['_id']}`", parse_mode="Markdown")
 
 # --- GLOBAL MESSAGE FILTER ---
 # This handler catches all messages that weren't handled by specific command handlers above.
@@ -994,28 +2040,21 @@ def delete_all_messages(message):
     if message.text and message.text.startswith('/start'):
         return
         
-    # Auto-Delete all other messages silently.
-    try:
-        bot.delete_message(message.chat.id, message.message_id)
-    except Exception as e:
-        # Silently fail if deletion fails (e.g. message already deleted or bot lacks permissions)
-        pass
+    # Auto-Delete all other messages silently (batched in the background).
+    deletion_queue.delete(message.chat.id, message.message_id)
 
 if __name__ == '__main__':
+    # Development entry point: a single process running the Flask server, the bots
+    # and broadcasts. Production runs `gunicorn -c gunicorn.conf.py` instead.
     print("DEBUG: bot.py main starting")
     
+    start_background_services()
+    
     # Start the Flask keep-alive server in a separate thread
     flask_thread = threading.Thread(target=run_flask)
     flask_thread.daemon = True
     flask_thread.start()
     
-    # Start User Bot polling in a separate thread
-    threading.Thread(target=bot.infinity_polling, daemon=True).start()
-    
-    # Start Admin Bot polling if token exists
-    if ADMIN_TOKEN and admin_bot != bot:
-        threading.Thread(target=admin_bot.infinity_polling, daemon=True).start()
-    
     # Keep the main thread alive
     while True:
         import time
@@ -40,6 +40,8 @@ interface AdminProps {
   onApproveTask: (taskId: string, isVideo: boolean) => Promise<void>;
   onRejectTask: (taskId: string, isVideo: boolean) => Promise<void>;
   onResetDevice: (userId: number) => Promise<void>;
+  onLoadMoreUsers?: () => Promise<void>;
+  onLoadMoreWithdrawals?: () => Promise<void>;
 }
 
 const Admin: React.FC<AdminProps> = ({ 
@@ -47,7 +49,8 @@ const Admin: React.FC<AdminProps> = ({
   maintenanceSettings, onUpdateMaintenance, onAction, 
   onAddTask, onAddAdTask, onDeleteTask, onDeleteAdTask, 
   onUnban, onUpdateBalance, onResetLeaderboard, 
-  onApproveTask, onRejectTask, onResetDevice 
+  onApproveTask, onRejectTask, onResetDevice,
+  onLoadMoreUsers, onLoadMoreWithdrawals
 }) => {
   const [activeAdminTab, setActiveAdminTab] = useState<'system' | 'payouts' | 'messaging' | 'balances' | 'tasks' | 'approvals' | 'users' | 'deposits' | 'logs' | 'danger'>('danger');
   const [searchUserId, setSearchUserId] = useState<string>('');
@@ -207,6 +210,7 @@ const Admin: React.FC<AdminProps> = ({
               withdrawals={withdrawals} 
               users={users}
               onAction={onAction} 
+              onLoadMore={onLoadMoreWithdrawals}
             />
           )}
 
@@ -236,6 +240,7 @@ const Admin: React.FC<AdminProps> = ({
               onUnban={onUnban}
               onResetDevice={onResetDevice}
               onUpdateBalance={onUpdateBalance}
+              onLoadMore={onLoadMoreUsers}
               onManageUser={(userId) => {
                 setSearchUserId(userId.toString());
                 setActiveAdminTab('balances');
@@ -14,10 +14,22 @@ interface AdminPayoutsProps {
   withdrawals: WithdrawalRequest[];
   users: UserProfile[];
   onAction: (id: string, type: 'submission' | 'withdrawal', status: any) => Promise<void>;
+  onLoadMore?: () => Promise<void>;
 }
 
-export const AdminPayouts: React.FC<AdminPayoutsProps> = ({ withdrawals, users, onAction }) => {
+export const AdminPayouts: React.FC<AdminPayoutsProps> = ({ withdrawals, users, onAction, onLoadMore }) => {
   const [processingId, setProcessingId] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+
+  const handleLoadMore = async () => {
+    if (!onLoadMore) return;
+    setIsLoadingMore(true);
+    try {
+      await onLoadMore();
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
   const [searchQuery, setSearchQuery] = useState('');
 
   // Statistics Calculations
@@ -319,6 +331,17 @@ export const AdminPayouts: React.FC<AdminPayoutsProps> = ({ withdrawals, users,
             </div>
           )}
         </div>
+
+        {onLoadMore && (
+          <button
+            onClick={handleLoadMore}
+            disabled={isLoadingMore}
+            className="w-full py-3 rounded-2xl bg-white/5 border border-white/10 text-[10px] font-black uppercase tracking-widest text-slate-400 hover:text-white transition-all flex items-center justify-center gap-2 disabled:opacity-50"
+          >
+            {isLoadingMore ? <Loader2 size={12} className="animate-spin" /> : <History size={12} />}
+            Load Older Withdrawals
+          </button>
+        )}
       </div>
     </div>
   );
@@ -17,12 +17,24 @@ interface AdminUsersProps {
   onResetDevice: (userId: number) => Promise<void>;
   onUpdateBalance: (userId: number, amount: number, currency: 'SAR' | 'USDT', type: 'ADJUSTMENT', description: string) => Promise<void>;
   onManageUser: (userId: number) => void;
+  onLoadMore?: () => Promise<void>;
 }
 
 export const AdminUsers: React.FC<AdminUsersProps> = ({ 
-  users, onUnban, onResetDevice, onUpdateBalance, onManageUser
+  users, onUnban, onResetDevice, onUpdateBalance, onManageUser, onLoadMore
 }) => {
   const [search, setSearch] = useState('');
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+
+  const handleLoadMore = async () => {
+    if (!onLoadMore) return;
+    setIsLoadingMore(true);
+    try {
+      await onLoadMore();
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
   const [expandedUserId, setExpandedUserId] = useState<number | null>(null);
   const [adjustment, setAdjustment] = useState({ amount: '', currency: 'SAR' as 'SAR' | 'USDT' });
   const [userMessage, setUserMessage] = useState('');
@@ -55,7 +67,7 @@ export const AdminUsers: React.FC<AdminUsersProps> = ({
             <Users size={12} className="text-neon-blue" /> User Directory
           </h3>
           <span className="text-[9px] font-black text-neon-blue bg-neon-blue/10 px-2 py-0.5 rounded-full border border-neon-blue/20">
-            {users.length} TOTAL
+            {users.length}{onLoadMore ? '+' : ''} LOADED
           </span>
         </div>
 
@@ -231,6 +243,17 @@ export const AdminUsers: React.FC<AdminUsersProps> = ({
             })
           )}
         </div>
+
+        {onLoadMore && (
+          <button
+            onClick={handleLoadMore}
+            disabled={isLoadingMore}
+            className="w-full py-3 rounded-2xl bg-white/5 border border-white/10 text-[10px] font-black uppercase tracking-widest text-slate-400 hover:text-white transition-all flex items-center justify-center gap-2 disabled:opacity-50"
+          >
+            {isLoadingMore ? <RefreshCw size={12} className="animate-spin" /> : <ChevronDown size={12} />}
+            Load More Users
+          </button>
+        )}
       </section>
     </div>
   );
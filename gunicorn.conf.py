@@ -0,0 +1,31 @@
+"""Production server settings: `gunicorn -c gunicorn.conf.py`.
+
+Workers import the app after fork (preload_app is off), so each one creates its
+own MongoClients. Telegram polling and broadcasts run in a single worker, see
+bot.run_singleton_services.
+"""
+import os
+
+wsgi_app = "bot:server"
+bind = f"0.0.0.0:{os.getenv('PORT', '3000')}"
+
+worker_class = "gthread"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+threads = int(os.getenv('WEB_THREADS', '8'))
+backlog = int(os.getenv('WEB_BACKLOG', '2048'))
+preload_app = False
+
+timeout = int(os.getenv('WEB_TIMEOUT', '60'))
+keepalive = 5
+# On SIGTERM workers stop accepting connections and get this long to finish in-flight requests
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', '30'))
+
+accesslog = "-"
+
+def post_worker_init(worker):
+    import bot
+    bot.start_background_services()
+
+def worker_exit(server, worker):
+    import bot
+    bot.stop_background_services()
@@ -0,0 +1,72 @@
+"""
+Send a fake Telegram update to a running server's webhook route.
+
+Standalone on purpose: importing bot.py builds the bots and talks to Telegram,
+while this only needs the bot tokens to sign the request.
+
+    python send_update.py --text /start --url http://localhost:3000
+"""
+import os
+import hmac
+import json
+import time
+import hashlib
+import urllib.request
+
+# Signs webhook_secret() when set, otherwise the bot token is the key
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+
+BOT_TOKENS = {"user": os.getenv('BOT_TOKEN'), "admin": os.getenv('ADMIN_BOT_TOKEN')}
+
+def webhook_secret(name, token):
+    """Secret Telegram sends back in X-Telegram-Bot-Api-Secret-Token for this bot's webhook."""
+    key = (WEBHOOK_SECRET or token or '').encode()
+    return hmac.new(key, name.encode(), hashlib.sha256).hexdigest()
+
+def fake_update(text=None, callback_data=None, user_id=929198867, chat_type="private"):
+    """A minimal Telegram update carrying a message or a button press, for local testing."""
+    now = int(time.time())
+    sender = {"id": int(user_id), "is_bot": False, "first_name": "Test", "username": f"user_{user_id}"}
+    message = {
+        "message_id": now % 1000000,
+        "date": now,
+        "chat": {"id": int(user_id), "type": chat_type},
+        "from": sender,
+        "text": text or ""
+    }
+    update = {"update_id": int(time.time() * 1000) % 2**31}
+    if callback_data is not None:
+        update["callback_query"] = {
+            "id": str(update["update_id"]),
+            "from": sender,
+            "chat_instance": str(user_id),
+            "data": callback_data,
+            "message": message
+        }
+    else:
+        update["message"] = message
+    return update
+
+def send_fake_update(update, name="user", base_url="http://localhost:3000"):
+    """POST an update to a running server's webhook route the way Telegram does."""
+    req = urllib.request.Request(
+        f"{base_url.rstrip('/')}/webhook/{name}",
+        data=json.dumps(update).encode(),
+        headers={"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": webhook_secret(name, BOT_TOKENS.get(name))},
+        method="POST"
+    )
+    with urllib.request.urlopen(req, timeout=10) as response:
+        return response.status
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Send a fake Telegram update to a running server's webhook")
+    parser.add_argument("--text", default="/start", help="Message text (default: /start)")
+    parser.add_argument("--callback", help="Send a button press with this callback data instead of a message")
+    parser.add_argument("--user-id", type=int, default=929198867)
+    parser.add_argument("--bot", default="user", choices=sorted(BOT_TOKENS))
+    parser.add_argument("--url", default="http://localhost:3000", help="Base URL of the server")
+
+    cli_args = parser.parse_args()
+    update = fake_update(cli_args.text, cli_args.callback, cli_args.user_id)
+    print(f"Webhook answered {send_fake_update(update, cli_args.bot, cli_args.url)}")
@@ -33,3 +33,14 @@ export const fetchWithTimeout = async (url: string, options: any = {}, timeout =
     } as any;
   }
 };
+
+// Admin listings are paginated: each page is a plain array and the token for the
+// next one comes back in the X-Next-Cursor header (absent on the last page).
+export const fetchPage = async (url: string, cursor: string | null = null, timeout = 5000) => {
+  const pageUrl = cursor ? `${url}${url.includes('?') ? '&' : '?'}cursor=${encodeURIComponent(cursor)}` : url;
+  const response = await fetchWithTimeout(pageUrl, {}, timeout);
+  if (!response.ok) return null;
+  const items = await response.json();
+  if (!Array.isArray(items)) return null;
+  return { items, nextCursor: (response.headers?.get('X-Next-Cursor') as string | null) || null };
+};
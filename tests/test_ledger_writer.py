@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+
+# MongoClient connects lazily, so importing database needs no server
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+
+class FailingWriter(db.LedgerWriter):
+    def __init__(self, **kwargs):
+        super().__init__(None, **kwargs)
+        self.attempts = 0
+
+    def _store(self, batch):
+        self.attempts += 1
+        return batch
+
+
+def test_failed_flush_backs_off_with_full_buffer():
+    writer = FailingWriter(batch_size=10, flush_interval=0.05, max_buffer=100)
+    writer.write([{"userId": 1, "amount": i} for i in range(50)])
+    time.sleep(2)
+    attempts = writer.attempts
+    writer.close(timeout=5)
+    # Backoff doubles from 0.5s: attempts at 0, 0.5, 1.5 seconds
+    assert 1 <= attempts <= 4
+    assert writer.stats()["pending"] == 50
+    assert writer._thread is None or not writer._thread.is_alive()
+
+
+def test_rows_written_after_recovery():
+    writer = FailingWriter(batch_size=10, flush_interval=0.05, max_buffer=100)
+    stored = []
+    writer._store = lambda batch: stored.extend(batch) or []
+    writer.write([{"userId": 1, "amount": i} for i in range(25)])
+    writer.close(timeout=5)
+    assert [row["amount"] for row in stored] == list(range(25))
+    assert writer.stats()["written"] == 25